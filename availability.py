@@ -0,0 +1,168 @@
+import time
+from array import array
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Book, Event
+
+
+# ===========================================
+# ÍNDICE DE DISPONIBILIDAD EN MEMORIA
+# ===========================================
+
+# Estados posibles de cada posición del índice (un byte por libro)
+UNKNOWN = -1
+UNAVAILABLE = 0
+AVAILABLE = 1
+
+# Intervalo mínimo entre comprobaciones del outbox: los cambios de otros
+# procesos se ven con, como mucho, este retraso (segundos)
+SYNC_INTERVAL = 0.1
+
+
+class AvailabilityIndex:
+    """Índice compacto de disponibilidad indexado por ID de libro.
+
+    Guarda un byte por libro en un ``array('b')``. Las posiciones en
+    ``UNKNOWN`` (o fuera de rango) son un fallo de caché y obligan a
+    consultar la base de datos.
+
+    ``seq`` es el último evento del outbox (tabla ``events``) aplicado al
+    índice; ``sync()`` lo compara con la base de datos, como mucho una vez
+    cada ``sync_interval`` segundos, para invalidar los libros que otros
+    procesos hayan modificado.
+    """
+
+    def __init__(self, sync_interval: float = SYNC_INTERVAL):
+        self._slots = array("b")
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self.loaded = False
+        self.version = 0
+        self.seq = 0
+        self.sync_interval = sync_interval
+        self._synced_at = float("-inf")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _ensure_capacity(self, book_id: int) -> None:
+        missing = book_id + 1 - len(self._slots)
+        if missing > 0:
+            self._slots.extend(array("b", [UNKNOWN]) * missing)
+
+    def load(self, db: Session) -> None:
+        """Cargar en bloque la disponibilidad de todos los libros.
+
+        Los libros modificados durante la lectura (en este u otro proceso)
+        tienen eventos posteriores a ``start_seq``; se invalidan repitiendo
+        esos eventos con ``sync()`` en lugar de descartar toda la carga.
+        """
+        start_seq = db.query(func.max(Event.seq)).scalar() or 0
+        rows = db.query(Book.id, Book.available).all()
+
+        slots = array("b")
+        if rows:
+            slots = array("b", [UNKNOWN]) * (max(row[0] for row in rows) + 1)
+            for book_id, available in rows:
+                slots[book_id] = AVAILABLE if available else UNAVAILABLE
+
+        with self._lock:
+            self._slots = slots
+            self.seq = start_seq
+            self.loaded = True
+            self.version += 1
+        self.sync(db, force=True)
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Cargar el índice una sola vez aunque lleguen peticiones concurrentes.
+
+        Mientras otro hilo carga, las demás peticiones no esperan: el índice
+        sigue sin cargar y van a la base de datos.
+        """
+        if self.loaded or not self._load_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.loaded:
+                self.load(db)
+        finally:
+            self._load_lock.release()
+
+    def sync(self, db: Session, force: bool = False) -> None:
+        """Invalidar los libros modificados desde ``seq`` en cualquier proceso.
+
+        Salvo con ``force``, consulta ``events`` como mucho una vez cada
+        ``sync_interval`` segundos; entre medias no hay ida a la base de datos.
+        """
+        now = time.monotonic()
+        if not force and now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+
+        latest = db.query(func.max(Event.seq)).scalar() or 0
+        seq = self.seq
+        if latest <= seq:
+            return
+
+        changed = (
+            db.query(Event.entity_id)
+            .filter(Event.seq > seq, Event.seq <= latest, Event.entity == "book")
+            .all()
+        )
+        with self._lock:
+            for (book_id,) in changed:
+                if 0 <= book_id < len(self._slots):
+                    self._slots[book_id] = UNKNOWN
+            self.seq = max(self.seq, latest)
+            self.version += 1
+
+    def get(self, book_id: int) -> Optional[bool]:
+        """Devolver la disponibilidad, o None si hay que ir a la base de datos"""
+        if not self.loaded or book_id < 0 or book_id >= len(self._slots):
+            return None
+        state = self._slots[book_id]
+        if state == UNKNOWN:
+            return None
+        return state == AVAILABLE
+
+    def set(self, book_id: int, available: bool) -> None:
+        """Registrar la disponibilidad de un libro tras un commit"""
+        with self._lock:
+            self._ensure_capacity(book_id)
+            self._slots[book_id] = AVAILABLE if available else UNAVAILABLE
+            self.version += 1
+
+    def fill(self, book_id: int, available: bool, version: int) -> None:
+        """Rellenar un fallo de caché leído de la base de datos.
+
+        Solo se guarda si nadie modificó el índice desde ``version``; si no,
+        el valor leído podría estar desactualizado.
+        """
+        with self._lock:
+            if self.version != version:
+                return
+            self._ensure_capacity(book_id)
+            self._slots[book_id] = AVAILABLE if available else UNAVAILABLE
+
+    def discard(self, book_id: int) -> None:
+        """Olvidar un libro (eliminado o en estado dudoso)"""
+        with self._lock:
+            if 0 <= book_id < len(self._slots):
+                self._slots[book_id] = UNKNOWN
+            self.version += 1
+
+    def reset(self) -> None:
+        """Vaciar el índice por completo"""
+        with self._lock:
+            self._slots = array("b")
+            self.loaded = False
+            self.version += 1
+            self.seq = 0
+            self._synced_at = float("-inf")
+
+
+# Índice compartido por la aplicación
+availability_index = AvailabilityIndex()
@@ -0,0 +1,107 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import random
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from availability import AvailabilityIndex
+
+
+# ===========================================
+# BENCHMARK: ÍNDICE DE DISPONIBILIDAD
+# ===========================================
+
+TOTAL_BOOKS = int(os.getenv("BENCH_TOTAL_BOOKS", "10000000"))
+LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "1000000"))
+
+# Ruta completa del endpoint (índice + sync) contra una base de datos real
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "sqlite://")
+ENDPOINT_BOOKS = int(os.getenv("BENCH_ENDPOINT_BOOKS", "100000"))
+ENDPOINT_LOOKUPS = int(os.getenv("BENCH_ENDPOINT_LOOKUPS", "100000"))
+
+
+def build_index(total: int) -> AvailabilityIndex:
+    """Construir un índice con `total` libros, 1 de cada 4 prestado"""
+    index = AvailabilityIndex()
+    index.set(total, True)  # reservar todas las posiciones de una vez
+    for book_id in range(1, total):
+        index.set(book_id, book_id % 4 != 0)
+    index.loaded = True
+    return index
+
+
+def bench_endpoint() -> None:
+    """Comparar check_book_availability con la consulta por libro anterior"""
+    from database import Base
+    from models import Author, Book
+    from main import check_book_availability
+    from availability import availability_index
+
+    if BENCH_DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(BENCH_DATABASE_URL, connect_args={"check_same_thread": False},
+                               poolclass=StaticPool)
+    else:
+        engine = create_engine(BENCH_DATABASE_URL)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with Session(engine) as db:
+        db.execute(insert(Author), [{"id": 1, "name": "Autor", "nationality": "Bench"}])
+        db.execute(insert(Book), [
+            {"id": i, "title": f"Libro {i}", "isbn": f"ISBN-{i}", "author_id": 1, "available": i % 4 != 0}
+            for i in range(1, ENDPOINT_BOOKS + 1)
+        ])
+        db.commit()
+
+        ids = [random.randint(1, ENDPOINT_BOOKS) for _ in range(ENDPOINT_LOOKUPS)]
+
+        # Antes: un Book completo por consulta
+        start = time.perf_counter()
+        for book_id in ids:
+            db.query(Book).filter(Book.id == book_id).first().available
+        db_seconds = time.perf_counter() - start
+
+        # Ahora: el handler con el índice, incluida la sincronización con el outbox
+        availability_index.reset()
+        start = time.perf_counter()
+        for book_id in ids:
+            check_book_availability(book_id, db)
+        index_seconds = time.perf_counter() - start
+
+    Base.metadata.drop_all(bind=engine)
+    print(f"Endpoint ({engine.dialect.name}, {ENDPOINT_BOOKS:,} libros, incluida la carga inicial):")
+    print(f"  consulta por libro: {ENDPOINT_LOOKUPS / db_seconds:,.0f} consultas/s")
+    print(f"  índice + sync:      {ENDPOINT_LOOKUPS / index_seconds:,.0f} consultas/s")
+
+
+def main():
+    start = time.perf_counter()
+    index = build_index(TOTAL_BOOKS)
+    build_seconds = time.perf_counter() - start
+
+    footprint = sys.getsizeof(index._slots)
+    print(f"Libros: {TOTAL_BOOKS:,}")
+    print(f"Memoria del índice: {footprint / 1024 / 1024:.1f} MiB "
+          f"({footprint / TOTAL_BOOKS:.2f} bytes/libro)")
+    print(f"Construcción: {build_seconds:.3f} s")
+
+    ids = [random.randint(1, TOTAL_BOOKS) for _ in range(LOOKUPS)]
+    get = index.get
+    start = time.perf_counter()
+    for book_id in ids:
+        get(book_id)
+    lookup_seconds = time.perf_counter() - start
+
+    print(f"Consultas: {LOOKUPS:,} en {lookup_seconds:.3f} s "
+          f"({LOOKUPS / lookup_seconds:,.0f} consultas/s)")
+
+    bench_endpoint()
+
+
+if __name__ == "__main__":
+    main()
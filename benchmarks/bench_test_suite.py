@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+import time
+
+
+# ===========================================
+# BENCHMARK: DURACIÓN DE LA SUITE DE PRUEBAS
+# ===========================================
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "3"))
+
+MODES = {
+    "serie": [],
+    "paralelo (-n auto)": ["-n", "auto"]
+}
+
+
+def run_suite(extra_args: list) -> float:
+    """Ejecutar la suite completa y devolver su duración en segundos"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "tests", *extra_args],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"La suite falló (código {result.returncode})")
+    return elapsed
+
+
+def main():
+    for name, extra_args in MODES.items():
+        timings = [run_suite(extra_args) for _ in range(ROUNDS)]
+        print(f"{name}: mejor {min(timings):.2f} s, media {sum(timings) / len(timings):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
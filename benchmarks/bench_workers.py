@@ -0,0 +1,90 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import subprocess
+import time
+from multiprocessing import Pool
+
+import httpx
+
+
+# ===========================================
+# BENCHMARK: RENDIMIENTO SEGÚN NÚMERO DE WORKERS
+# ===========================================
+
+SERVER_SCRIPT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server.py'))
+PORT = int(os.getenv("BENCH_PORT", "8100"))
+PATH = os.getenv("BENCH_PATH", "/")
+DURATION = float(os.getenv("BENCH_DURATION", "10"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "64"))
+CLIENT_PROCESSES = int(os.getenv("BENCH_CLIENT_PROCESSES", "4"))
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+async def _hammer(url: str, connections: int, duration: float) -> int:
+    """Lanzar peticiones en bucle durante `duration` segundos"""
+    deadline = time.perf_counter() + duration
+    completed = 0
+
+    async def client_loop(client):
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            response = await client.get(url)
+            if response.status_code == 200:
+                completed += 1
+
+    limits = httpx.Limits(max_connections=connections)
+    async with httpx.AsyncClient(limits=limits) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(connections)))
+    return completed
+
+
+def _client_process(args) -> int:
+    return asyncio.run(_hammer(*args))
+
+
+def wait_until_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El servidor no respondió en {url}")
+
+
+def measure(workers: int) -> float:
+    """Peticiones por segundo con `workers` procesos de servidor"""
+    server = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, "--workers", str(workers), "--port", str(PORT)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{PORT}{PATH}"
+        wait_until_ready(url)
+
+        per_process = max(1, CONCURRENCY // CLIENT_PROCESSES)
+        with Pool(CLIENT_PROCESSES) as pool:
+            results = pool.map(_client_process, [(url, per_process, DURATION)] * CLIENT_PROCESSES)
+        return sum(results) / DURATION
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    print(f"Endpoint: {PATH}  concurrencia: {CONCURRENCY}  duración: {DURATION:.0f} s")
+    baseline = None
+    for workers in WORKER_COUNTS:
+        throughput = measure(workers)
+        baseline = baseline or throughput
+        print(f"{workers} workers: {throughput:,.0f} peticiones/s (x{throughput / baseline:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import asyncio
+from threading import Lock
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models import Event
+
+
+# ===========================================
+# FEED DE CAMBIOS (OUTBOX DE EVENTOS)
+# ===========================================
+
+# Cada cuánto se vuelve a mirar la base de datos mientras se espera, para
+# ver eventos escritos por otros procesos
+POLL_INTERVAL = 1.0
+
+# Primera clave del lock de Postgres que ordena las escrituras en el outbox;
+# la segunda sale de la base de datos y el esquema, así cada outbox tiene
+# su propio lock (p. ej. un esquema por worker de pytest-xdist)
+OUTBOX_LOCK_KEY = 7301
+
+
+def record_change(db: Session, entity: str, action: str, entity_id: int, payload: Optional[dict] = None) -> None:
+    """Añadir un evento al outbox dentro de la transacción en curso.
+
+    En Postgres se toma un lock de transacción para que el orden de
+    ``seq`` coincida con el orden de commit y ningún consumidor se salte
+    un evento confirmado más tarde con una secuencia menor. El coste: las
+    escrituras sobre un mismo outbox se serializan desde este punto hasta
+    su commit, que en los handlers de main.py es inmediato.
+
+    Los cambios pendientes se vuelcan antes de pedir el lock: así los locks
+    de fila se toman siempre antes que el del outbox y quien lo tiene solo
+    inserta la fila del evento (sin esperas cruzadas ni deadlocks).
+    """
+    db.flush()
+    _lock_outbox(db)
+
+    db.add(Event(entity=entity, action=action, entity_id=entity_id, payload=payload))
+
+
+def _lock_outbox(db: Session) -> None:
+    """Lock de transacción del outbox de esta base de datos y esquema (solo Postgres)"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:key, hashtext(current_database() || '.' || current_schema()))"),
+            {"key": OUTBOX_LOCK_KEY}
+        )
+
+
+def fetch_changes(db: Session, since: int, limit: int) -> List[Event]:
+    """Eventos posteriores a ``since`` en orden de secuencia"""
+    return (
+        db.query(Event)
+        .filter(Event.seq > since)
+        .order_by(Event.seq)
+        .limit(limit)
+        .all()
+    )
+
+
+class ChangeNotifier:
+    """Aviso en memoria de nuevos eventos escritos por este proceso.
+
+    Cada espera registra un ``asyncio.Event`` que ``notify()`` activa desde
+    el hilo que hizo el commit; una espera sin cambios no consume CPU.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._waiters = set()
+        self.version = 0
+
+    def notify(self) -> None:
+        with self._lock:
+            self.version += 1
+            waiters = list(self._waiters)
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(waiter.set)
+            except RuntimeError:
+                # El event loop de esa espera ya se cerró
+                pass
+
+    async def wait_async(self, version: int, timeout: float) -> bool:
+        """Esperar sin bloquear el event loop a que cambie ``version``"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if self.version != version:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+# Notificador compartido por la aplicación
+change_notifier = ChangeNotifier()
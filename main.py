@@ -1,14 +1,22 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
 from datetime import datetime
+import time
 
-from database import engine, get_db, Base
+from database import engine, get_db, get_session_factory, Base
+from availability import availability_index
+from changes import record_change, fetch_changes, change_notifier, POLL_INTERVAL
 from models import (
     Author, Book, Loan,
-    AuthorCreate, AuthorResponse,
-    BookCreate, BookResponse,
-    LoanCreate, LoanResponse
+    AuthorCreate, AuthorResponse, AuthorWithCountsResponse,
+    BookCreate, BookResponse, AuthorBookResponse,
+    LoanCreate, LoanResponse,
+    ChangeEventResponse, ChangesResponse
 )
 
 # Crear las tablas
@@ -62,11 +70,75 @@ def root():
 
 
 # --- AUTHOR ENDPOINTS ---
-@app.get("/authors", response_model=List[AuthorResponse])
-def get_authors(db: Session = Depends(get_db)):
-    """Obtener todos los autores"""
-    authors = db.query(Author).all()
-    return authors
+@app.get("/authors", response_model=List[Union[AuthorWithCountsResponse, AuthorResponse]])
+def get_authors(
+    with_counts: bool = False,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Obtener todos los autores, opcionalmente con conteos de libros y préstamos"""
+    if not with_counts:
+        query = db.query(Author)
+        if skip or limit is not None:
+            query = query.order_by(Author.id).offset(skip).limit(limit)
+        return query.all()
+
+    # Paginar primero los autores y agrupar solo sus libros y préstamos,
+    # todo en una sola consulta
+    page = (
+        db.query(Author.id.label("id"))
+        .order_by(Author.id)
+        .offset(skip)
+        .limit(limit)
+        .cte("author_page")
+    )
+    book_counts = (
+        db.query(
+            Book.author_id.label("author_id"),
+            func.count(Book.id).label("book_count"),
+            func.sum(case((Book.available == True, 1), else_=0)).label("available_count")
+        )
+        .filter(Book.author_id.in_(select(page.c.id)))
+        .group_by(Book.author_id)
+        .subquery()
+    )
+    loan_counts = (
+        db.query(
+            Book.author_id.label("author_id"),
+            func.count(Loan.id).label("active_loan_count")
+        )
+        .join(Loan, Loan.book_id == Book.id)
+        .filter(Book.author_id.in_(select(page.c.id)), Loan.returned == False)
+        .group_by(Book.author_id)
+        .subquery()
+    )
+
+    rows = (
+        db.query(
+            Author,
+            func.coalesce(book_counts.c.book_count, 0),
+            func.coalesce(book_counts.c.available_count, 0),
+            func.coalesce(loan_counts.c.active_loan_count, 0)
+        )
+        .join(page, page.c.id == Author.id)
+        .outerjoin(book_counts, book_counts.c.author_id == Author.id)
+        .outerjoin(loan_counts, loan_counts.c.author_id == Author.id)
+        .order_by(Author.id)
+        .all()
+    )
+
+    return [
+        {
+            "id": author.id,
+            "name": author.name,
+            "nationality": author.nationality,
+            "book_count": book_count,
+            "available_count": available_count,
+            "active_loan_count": active_loan_count
+        }
+        for author, book_count, available_count, active_loan_count in rows
+    ]
 
 
 @app.get("/authors/{author_id}", response_model=AuthorResponse)
@@ -78,6 +150,58 @@ def get_author(author_id: int, db: Session = Depends(get_db)):
     return author
 
 
+@app.get("/authors/{author_id}/books", response_model=List[AuthorBookResponse])
+def get_author_books(
+    author_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Obtener los libros de un autor con sus préstamos activos"""
+    author = db.query(Author).filter(Author.id == author_id).first()
+    if not author:
+        raise HTTPException(status_code=404, detail="Author not found")
+
+    # Paginar primero los libros del autor y contar solo sus préstamos activos
+    page = (
+        db.query(Book.id.label("id"))
+        .filter(Book.author_id == author_id)
+        .order_by(Book.id)
+        .offset(skip)
+        .limit(limit)
+        .cte("book_page")
+    )
+    loan_counts = (
+        db.query(
+            Loan.book_id.label("book_id"),
+            func.count(Loan.id).label("active_loan_count")
+        )
+        .filter(Loan.book_id.in_(select(page.c.id)), Loan.returned == False)
+        .group_by(Loan.book_id)
+        .subquery()
+    )
+
+    rows = (
+        db.query(Book, func.coalesce(loan_counts.c.active_loan_count, 0))
+        .join(page, page.c.id == Book.id)
+        .outerjoin(loan_counts, loan_counts.c.book_id == Book.id)
+        .order_by(Book.id)
+        .all()
+    )
+
+    return [
+        {
+            "id": book.id,
+            "title": book.title,
+            "isbn": book.isbn,
+            "author_id": book.author_id,
+            "available": book.available,
+            "active_loan_count": active_loan_count
+        }
+        for book, active_loan_count in rows
+    ]
+
+
 @app.post("/authors", response_model=AuthorResponse, status_code=201)
 def create_author(author: AuthorCreate, db: Session = Depends(get_db)):
     """Crear nuevo autor"""
@@ -91,7 +215,11 @@ def create_author(author: AuthorCreate, db: Session = Depends(get_db)):
         nationality=author.nationality.strip().title()
     )
     db.add(db_author)
+    db.flush()
+    record_change(db, "author", "created", db_author.id,
+                  AuthorResponse.model_validate(db_author).model_dump(mode="json"))
     db.commit()
+    change_notifier.notify()
     db.refresh(db_author)
     return db_author
 
@@ -103,8 +231,19 @@ def delete_author(author_id: int, db: Session = Depends(get_db)):
     if not author:
         raise HTTPException(status_code=404, detail="Author not found")
 
-    db.delete(author)
-    db.commit()
+    # No dejar libros huérfanos (ni filas cambiadas sin evento en el feed)
+    if db.query(Book.id).filter(Book.author_id == author_id).first():
+        raise HTTPException(status_code=400, detail="Author has books")
+
+    try:
+        db.delete(author)
+        record_change(db, "author", "deleted", author_id)
+        db.commit()
+    except IntegrityError:
+        # Se creó un libro del autor entre la comprobación y el borrado
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Author has books")
+    change_notifier.notify()
     return None
 
 
@@ -139,8 +278,13 @@ def create_book(book: BookCreate, db: Session = Depends(get_db)):
     # Crear
     db_book = Book(**transformed_data)
     db.add(db_book)
+    db.flush()
+    record_change(db, "book", "created", db_book.id,
+                  BookResponse.model_validate(db_book).model_dump(mode="json"))
     db.commit()
+    change_notifier.notify()
     db.refresh(db_book)
+    availability_index.discard(db_book.id)
     return db_book
 
 
@@ -151,8 +295,20 @@ def delete_book(book_id: int, db: Session = Depends(get_db)):
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    db.delete(book)
-    db.commit()
+    # No dejar préstamos huérfanos (ni filas cambiadas sin evento en el feed)
+    if db.query(Loan.id).filter(Loan.book_id == book_id).first():
+        raise HTTPException(status_code=400, detail="Book has active loans")
+
+    try:
+        db.delete(book)
+        record_change(db, "book", "deleted", book_id)
+        db.commit()
+    except IntegrityError:
+        # Se creó un préstamo del libro entre la comprobación y el borrado
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Book has active loans")
+    change_notifier.notify()
+    availability_index.discard(book_id)
     return None
 
 
@@ -193,8 +349,15 @@ def create_loan(loan: LoanCreate, db: Session = Depends(get_db)):
     book.available = False
 
     db.add(db_loan)
+    db.flush()
+    record_change(db, "loan", "created", db_loan.id,
+                  LoanResponse.model_validate(db_loan).model_dump(mode="json"))
+    record_change(db, "book", "updated", book.id,
+                  BookResponse.model_validate(book).model_dump(mode="json"))
     db.commit()
+    change_notifier.notify()
     db.refresh(db_loan)
+    availability_index.discard(loan.book_id)
     return db_loan
 
 
@@ -211,7 +374,14 @@ def delete_loan(loan_id: int, db: Session = Depends(get_db)):
         book.available = True
 
     db.delete(loan)
+    record_change(db, "loan", "deleted", loan_id)
+    if book:
+        record_change(db, "book", "updated", book.id,
+                      BookResponse.model_validate(book).model_dump(mode="json"))
     db.commit()
+    change_notifier.notify()
+    if book:
+        availability_index.discard(book.id)
     return None
 
 
@@ -219,10 +389,22 @@ def delete_loan(loan_id: int, db: Session = Depends(get_db)):
 @app.get("/books/{book_id}/availability")
 def check_book_availability(book_id: int, db: Session = Depends(get_db)):
     """Verificar disponibilidad de un libro"""
+    # Carga en bloque del índice en la primera consulta; los cambios de otros
+    # procesos se comprueban como mucho cada SYNC_INTERVAL
+    availability_index.ensure_loaded(db)
+    availability_index.sync(db)
+
+    available = availability_index.get(book_id)
+    if available is not None:
+        return {"book_id": book_id, "available": available}
+
+    # Fallo de caché: consultar la base de datos
+    version = availability_index.version
     book = db.query(Book).filter(Book.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
+    availability_index.fill(book_id, book.available, version)
     return {"book_id": book_id, "available": book.available}
 
 
@@ -231,4 +413,70 @@ def get_loan_statistics(db: Session = Depends(get_db)):
     """Obtener estadísticas de préstamos"""
     loans = db.query(Loan).all()
     stats = calculate_loan_statistics(loans)
-    return stats
\ No newline at end of file
+    return stats
+
+
+# --- CHANGE FEED ENDPOINTS ---
+def _changes_page(db: Session, since: int, limit: int) -> dict:
+    """Página de eventos con el cursor para la siguiente petición"""
+    events = fetch_changes(db, since, limit)
+    last_seq = events[-1].seq if events else since
+    # Liberar la conexión mientras el cliente espera
+    db.rollback()
+    return {
+        "events": [ChangeEventResponse.model_validate(event) for event in events],
+        "last_seq": last_seq
+    }
+
+
+@app.get("/changes", response_model=ChangesResponse)
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    timeout: float = Query(0, ge=0, le=60),
+    db: Session = Depends(get_db)
+):
+    """Obtener los eventos posteriores a `since`, esperando hasta `timeout` segundos si no hay"""
+    deadline = time.monotonic() + timeout
+    while True:
+        version = change_notifier.version
+        page = await run_in_threadpool(_changes_page, db, since, limit)
+        remaining = deadline - time.monotonic()
+        if page["events"] or remaining <= 0:
+            return page
+        await change_notifier.wait_async(version, min(remaining, POLL_INTERVAL))
+
+
+@app.get("/changes/stream")
+async def stream_changes(
+    since: Optional[int] = Query(None, ge=0),
+    timeout: float = Query(300, ge=0, le=3600),
+    last_event_id: Optional[int] = Header(None),
+    session_factory=Depends(get_session_factory)
+):
+    """Emitir los eventos como Server-Sent Events durante `timeout` segundos"""
+    cursor = last_event_id if last_event_id is not None else (since or 0)
+
+    async def event_stream():
+        nonlocal cursor
+        deadline = time.monotonic() + timeout
+        # Sesión propia: la de get_db se cierra antes de enviar el cuerpo
+        db = session_factory()
+        try:
+            while True:
+                version = change_notifier.version
+                page = await run_in_threadpool(_changes_page, db, cursor, 1000)
+                for change in page["events"]:
+                    yield f"id: {change.seq}\nevent: change\ndata: {change.model_dump_json()}\n\n"
+                cursor = page["last_seq"]
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if not page["events"]:
+                    await change_notifier.wait_async(version, min(remaining, POLL_INTERVAL))
+        finally:
+            await run_in_threadpool(db.close)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
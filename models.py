@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 from database import Base
 
 
@@ -16,8 +17,8 @@ class Author(Base):
     name = Column(String, nullable=False)
     nationality = Column(String, nullable=False)
 
-    # Relación con libros
-    books = relationship("Book", back_populates="author")
+    # Relación con libros (el ORM nunca pone author_id a NULL al borrar)
+    books = relationship("Book", back_populates="author", passive_deletes="all")
 
 
 class Book(Base):
@@ -26,19 +27,19 @@ class Book(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     isbn = Column(String, nullable=False, unique=True)
-    author_id = Column(Integer, ForeignKey("authors.id"))
+    author_id = Column(Integer, ForeignKey("authors.id"), index=True)
     available = Column(Boolean, default=True)
 
     # Relaciones
     author = relationship("Author", back_populates="books")
-    loans = relationship("Loan", back_populates="book")
+    loans = relationship("Loan", back_populates="book", passive_deletes="all")
 
 
 class Loan(Base):
     __tablename__ = "loans"
 
     id = Column(Integer, primary_key=True, index=True)
-    book_id = Column(Integer, ForeignKey("books.id"))
+    book_id = Column(Integer, ForeignKey("books.id"), index=True)
     user_name = Column(String, nullable=False)
     loan_date = Column(DateTime, default=datetime.utcnow)
     returned = Column(Boolean, default=False)
@@ -47,6 +48,19 @@ class Loan(Base):
     book = relationship("Book", back_populates="loans")
 
 
+class Event(Base):
+    __tablename__ = "events"
+
+    # Secuencia creciente que usan los consumidores como cursor; 64 bits
+    # porque el outbox solo crece (en SQLite solo INTEGER es autoincremental)
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 # ===========================================
 # MODELOS PYDANTIC PARA LA API
 # ===========================================
@@ -66,6 +80,12 @@ class AuthorResponse(BaseModel):
         from_attributes = True
 
 
+class AuthorWithCountsResponse(AuthorResponse):
+    book_count: int
+    available_count: int
+    active_loan_count: int
+
+
 # --- BOOK MODELS ---
 class BookCreate(BaseModel):
     title: str
@@ -84,6 +104,10 @@ class BookResponse(BaseModel):
         from_attributes = True
 
 
+class AuthorBookResponse(BookResponse):
+    active_loan_count: int
+
+
 # --- LOAN MODELS ---
 class LoanCreate(BaseModel):
     book_id: int
@@ -98,4 +122,22 @@ class LoanResponse(BaseModel):
     returned: bool
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# --- CHANGE FEED MODELS ---
+class ChangeEventResponse(BaseModel):
+    seq: int
+    entity: str
+    entity_id: int
+    action: str
+    payload: Optional[dict]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ChangesResponse(BaseModel):
+    events: List[ChangeEventResponse]
+    last_seq: int
@@ -0,0 +1,147 @@
+import argparse
+import os
+
+
+# ===========================================
+# LANZADOR DE PRODUCCIÓN (MULTIPROCESO)
+# ===========================================
+
+# Conexiones de Postgres que se dejan libres para administración y migraciones
+RESERVED_CONNECTIONS = 10
+
+
+def default_workers() -> int:
+    """Número de workers según los núcleos disponibles para el proceso"""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def calculate_pool_sizes(workers: int, max_connections: int) -> dict:
+    """Repartir las conexiones de Postgres entre los workers.
+
+    El total (pool_size + max_overflow) de todos los workers no supera
+    ``max_connections`` menos las conexiones reservadas. Si no alcanza
+    para una conexión por worker se lanza ``ValueError``.
+    """
+    if workers < 1:
+        raise ValueError(f"workers debe ser al menos 1 (recibido {workers})")
+
+    budget = max_connections - RESERVED_CONNECTIONS
+    if budget < workers:
+        raise ValueError(
+            f"{workers} workers necesitan al menos {workers + RESERVED_CONNECTIONS} "
+            f"conexiones de Postgres (max_connections={max_connections}); "
+            f"reduce --workers o aumenta --max-connections"
+        )
+
+    per_worker = budget // workers
+    pool_size = min(5, per_worker)
+
+    return {
+        "pool_size": pool_size,
+        "max_overflow": per_worker - pool_size
+    }
+
+
+def positive_int(value: str) -> int:
+    """Tipo de argparse para enteros >= 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1 (recibido {number})")
+    return number
+
+
+def run_gunicorn(options: argparse.Namespace) -> None:
+    """Gunicorn con workers de uvicorn y la app precargada en el maestro.
+
+    El worker usa loop="auto" y http="auto": uvloop y httptools si están
+    instalados (requirements-extras.txt).
+    """
+    from gunicorn.app.base import BaseApplication
+    from uvicorn_worker import UvicornWorker
+
+    def post_fork(server, worker):
+        # Las conexiones abiertas en el maestro no se comparten entre procesos
+        from database import engine
+        engine.dispose(close=False)
+
+    def worker_exit(server, worker):
+        from database import engine
+        engine.dispose()
+
+    class LibraryApplication(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{options.host}:{options.port}",
+                "workers": options.workers,
+                "worker_class": UvicornWorker,
+                "preload_app": True,
+                "graceful_timeout": options.graceful_timeout,
+                "keepalive": 5,
+                "post_fork": post_fork,
+                "worker_exit": worker_exit
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    LibraryApplication().run()
+
+
+def run_uvicorn(options: argparse.Namespace) -> None:
+    """Uvicorn con su propio gestor de procesos (sin precarga; p. ej. Windows)"""
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=options.host,
+        port=options.port,
+        workers=options.workers,
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=options.graceful_timeout
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Biblioteca Digital API - servidor de producción")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=positive_int,
+                        default=os.getenv("WEB_CONCURRENCY", str(default_workers())))
+    parser.add_argument("--max-connections", type=int, default=int(os.getenv("PG_MAX_CONNECTIONS", "100")),
+                        help="max_connections del servidor Postgres")
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--server", choices=["auto", "gunicorn", "uvicorn"], default="auto")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    options = parse_args(argv)
+
+    # Debe fijarse antes de importar database.py
+    try:
+        pool = calculate_pool_sizes(options.workers, options.max_connections)
+    except ValueError as error:
+        raise SystemExit(f"error: {error}")
+    os.environ["DB_POOL_SIZE"] = str(pool["pool_size"])
+    os.environ["DB_MAX_OVERFLOW"] = str(pool["max_overflow"])
+
+    server = options.server
+    if server == "auto":
+        # Gunicorn no funciona en Windows
+        server = "uvicorn" if os.name == "nt" else "gunicorn"
+
+    if server == "gunicorn":
+        run_gunicorn(options)
+    else:
+        run_uvicorn(options)
+
+
+if __name__ == "__main__":
+    main()
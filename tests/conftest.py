@@ -0,0 +1,104 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from database import Base, get_db, get_session_factory
+from availability import availability_index
+
+
+# Base de datos de prueba: SQLite en memoria salvo que se indique otra
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite://")
+
+# Identificador del worker de pytest-xdist ("master" sin -n)
+WORKER_ID = os.getenv("PYTEST_XDIST_WORKER", "master")
+
+# Esquema propio del worker cuando se prueba contra Postgres
+TEST_SCHEMA = f"test_{WORKER_ID}"
+
+
+def _create_test_engine():
+    """Engine de pruebas aislado por worker"""
+    if TEST_DATABASE_URL.startswith("sqlite"):
+        # Cada worker es un proceso con su propia base de datos en memoria
+        engine = create_engine(
+            TEST_DATABASE_URL,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+
+        # pysqlite no emite BEGIN por sí mismo; necesario para los SAVEPOINT
+        @event.listens_for(engine, "connect")
+        def do_connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def do_begin(conn):
+            conn.exec_driver_sql("BEGIN")
+
+        return engine
+
+    # Postgres compartido: un esquema por worker
+    engine = create_engine(TEST_DATABASE_URL, connect_args={"options": f"-csearch_path={TEST_SCHEMA}"})
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA IF EXISTS "{TEST_SCHEMA}" CASCADE'))
+        conn.execute(text(f'CREATE SCHEMA "{TEST_SCHEMA}"'))
+    return engine
+
+
+@pytest.fixture(scope="session")
+def test_engine():
+    """Engine con el esquema creado una sola vez por sesión"""
+    engine = _create_test_engine()
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    if engine.dialect.name != "sqlite":
+        # No dejar esquemas test_gw* en la base de datos compartida
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA IF EXISTS "{TEST_SCHEMA}" CASCADE'))
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(test_engine):
+    """Sesión de prueba aislada: todo se deshace al terminar la prueba"""
+    connection = test_engine.connect()
+    transaction = connection.begin()
+    # Los commit() de la aplicación solo liberan un SAVEPOINT
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    availability_index.reset()
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+        availability_index.reset()
+
+
+@pytest.fixture
+def client(db_session):
+    """Cliente de prueba sobre la sesión aislada"""
+    from main import app
+
+    def override_get_db():
+        yield db_session
+
+    def override_get_session_factory():
+        # Sesiones nuevas sobre la misma conexión y transacción de la prueba
+        return lambda: Session(bind=db_session.bind, join_transaction_mode="create_savepoint")
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = override_get_session_factory
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_session_factory, None)
@@ -3,46 +3,11 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from main import app, get_db
-from database import Base
-
-
-
-# Base de datos de prueba (SQLite en memoria)
-TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite:///./test_library.db")
-
-# Detectar si es SQLite y usar connect_args solo en ese caso
-if TEST_DATABASE_URL.startswith("sqlite"):
-    test_engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    test_engine = create_engine(TEST_DATABASE_URL)
-
-# Crear sesión para pruebas
-TestSession = sessionmaker(bind=test_engine)
-
-
-def override_get_db():
-    db = TestSession()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-app.dependency_overrides[get_db] = override_get_db
-
-
-@pytest.fixture
-def client():
-    """Cliente de prueba con base de datos limpia"""
-    Base.metadata.create_all(bind=test_engine)
-    with TestClient(app) as test_client:
-        yield test_client
-    Base.metadata.drop_all(bind=test_engine)
+import json
+from sqlalchemy import event
+from models import Book, Loan
+from changes import record_change
+from availability import availability_index
 
 
 def test_get_authors_returns_200_and_complete_list(client):
@@ -165,4 +130,196 @@ def test_delete_loans_removes_and_returns_204_then_get_returns_404(client):
     assert all_loans_response.status_code == 200
     loans_list = all_loans_response.json()
     loan_ids = [loan["id"] for loan in loans_list]
-    assert loan_id not in loan_ids
\ No newline at end of file
+    assert loan_id not in loan_ids
+
+
+def test_availability_follows_loans_and_deletes(client):
+    """Prueba 4: GET /books/:id/availability refleja préstamos y eliminaciones"""
+    author_response = client.post("/authors", json={"name": "Jorge Luis Borges", "nationality": "Argentinian"})
+    author_id = author_response.json()["id"]
+
+    book_response = client.post("/books", json={"title": "Ficciones", "isbn": "9780802130303", "author_id": author_id})
+    book_id = book_response.json()["id"]
+
+    # Disponible al crearse
+    response = client.get(f"/books/{book_id}/availability")
+    assert response.status_code == 200
+    assert response.json() == {"book_id": book_id, "available": True}
+
+    # No disponible tras el préstamo
+    loan_response = client.post("/loans", json={"book_id": book_id, "user_name": "Ana Ruiz"})
+    loan_id = loan_response.json()["id"]
+    assert client.get(f"/books/{book_id}/availability").json()["available"] == False
+
+    # Disponible de nuevo tras la devolución
+    client.delete(f"/loans/{loan_id}")
+    assert client.get(f"/books/{book_id}/availability").json()["available"] == True
+
+    # 404 tras eliminar el libro
+    client.delete(f"/books/{book_id}")
+    response = client.get(f"/books/{book_id}/availability")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Book not found"
+
+
+def test_availability_sees_writes_from_other_processes(client, db_session, test_engine, monkeypatch):
+    """Prueba 5: el índice se invalida con préstamos hechos por otro worker"""
+    author_id = client.post("/authors", json={"name": "Ernesto Sabato", "nationality": "Argentinian"}).json()["id"]
+    book_data = {"title": "El Tunel", "isbn": "9789500396820", "author_id": author_id}
+    book_id = client.post("/books", json=book_data).json()["id"]
+
+    # El índice queda cargado con el libro disponible
+    assert client.get(f"/books/{book_id}/availability").json()["available"] == True
+
+    # Un acierto dentro del intervalo de sincronización no consulta la base de datos
+    monkeypatch.setattr(availability_index, "sync_interval", 60)
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", count_statement)
+    try:
+        assert client.get(f"/books/{book_id}/availability").json()["available"] == True
+    finally:
+        event.remove(test_engine, "before_cursor_execute", count_statement)
+    assert statements == []
+
+    # Sin ventana de retraso para comprobar la invalidación al momento
+    monkeypatch.setattr(availability_index, "sync_interval", 0)
+
+    # Otro proceso presta el libro: escribe en la base de datos y el outbox,
+    # pero no toca el índice de este proceso
+    book = db_session.query(Book).filter(Book.id == book_id).first()
+    book.available = False
+    db_session.add(Loan(book_id=book_id, user_name="Otro Worker"))
+    record_change(db_session, "book", "updated", book_id, {"id": book_id, "available": False})
+    db_session.commit()
+
+    assert client.get(f"/books/{book_id}/availability").json()["available"] == False
+
+
+def test_author_catalogue_with_counts_and_pagination(client, test_engine):
+    """Prueba 6: GET /authors/:id/books y GET /authors?with_counts=true con conteos"""
+    author_id = client.post("/authors", json={"name": "Laura Esquivel", "nationality": "Mexican"}).json()["id"]
+    other_id = client.post("/authors", json={"name": "Juan Rulfo", "nationality": "Mexican"}).json()["id"]
+
+    book_ids = []
+    for i in range(3):
+        book_data = {"title": f"Libro {i}", "isbn": f"978000000000{i}", "author_id": author_id}
+        book_ids.append(client.post("/books", json=book_data).json()["id"])
+    client.post("/loans", json={"book_id": book_ids[0], "user_name": "Pedro Gómez"})
+
+    # Contar las sentencias SQL de la petición: sin consultas por fila
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", count_statement)
+    try:
+        response = client.get("/authors", params={"with_counts": "true"})
+    finally:
+        event.remove(test_engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == 200
+    assert len(statements) == 1
+    authors = response.json()
+    assert authors[0]["id"] == author_id
+    assert authors[0]["book_count"] == 3
+    assert authors[0]["available_count"] == 2
+    assert authors[0]["active_loan_count"] == 1
+    assert authors[1]["id"] == other_id
+    assert authors[1]["book_count"] == 0
+    assert authors[1]["active_loan_count"] == 0
+
+    # Sin with_counts la respuesta no cambia
+    assert "book_count" not in client.get("/authors").json()[0]
+
+    # Libros del autor con préstamos activos y paginación
+    response = client.get(f"/authors/{author_id}/books", params={"skip": 0, "limit": 2})
+    assert response.status_code == 200
+    books = response.json()
+    assert [book["id"] for book in books] == book_ids[:2]
+    assert books[0]["active_loan_count"] == 1
+    assert books[0]["available"] == False
+    assert books[1]["active_loan_count"] == 0
+
+    next_page = client.get(f"/authors/{author_id}/books", params={"skip": 2, "limit": 2}).json()
+    assert [book["id"] for book in next_page] == book_ids[2:]
+
+    # Autor inexistente
+    response = client.get("/authors/9999/books")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Author not found"
+
+
+def test_changes_feed_returns_events_since_cursor(client):
+    """Prueba 7: GET /changes y /changes/stream devuelven eventos incrementales"""
+    author_id = client.post("/authors", json={"name": "Pablo Neruda", "nationality": "Chilean"}).json()["id"]
+    book_data = {"title": "Canto General", "isbn": "9780520082793", "author_id": author_id}
+    book_id = client.post("/books", json=book_data).json()["id"]
+
+    response = client.get("/changes")
+    assert response.status_code == 200
+    feed = response.json()
+    assert [(e["entity"], e["action"], e["entity_id"]) for e in feed["events"]] == [
+        ("author", "created", author_id),
+        ("book", "created", book_id)
+    ]
+    assert feed["events"][1]["payload"]["title"] == "CANTO GENERAL"
+    cursor = feed["last_seq"]
+
+    # Un préstamo genera el préstamo y la actualización del libro
+    loan_id = client.post("/loans", json={"book_id": book_id, "user_name": "Ana Ruiz"}).json()["id"]
+    feed = client.get("/changes", params={"since": cursor}).json()
+    assert [(e["entity"], e["action"], e["entity_id"]) for e in feed["events"]] == [
+        ("loan", "created", loan_id),
+        ("book", "updated", book_id)
+    ]
+    assert feed["events"][1]["payload"]["available"] == False
+    cursor = feed["last_seq"]
+
+    # Sin cambios: la espera termina vacía y el cursor no avanza
+    feed = client.get("/changes", params={"since": cursor, "timeout": 0.2}).json()
+    assert feed == {"events": [], "last_seq": cursor}
+
+    # Stream SSE desde el cursor (Last-Event-ID)
+    client.delete(f"/loans/{loan_id}")
+    response = client.get("/changes/stream", params={"timeout": 0}, headers={"Last-Event-ID": str(cursor)})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    data = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [(e["entity"], e["action"]) for e in data] == [("loan", "deleted"), ("book", "updated")]
+    assert data[1]["payload"]["available"] == True
+
+
+def test_delete_with_children_is_rejected_and_not_in_feed(client):
+    """Prueba 8: no se borran autores con libros ni libros con préstamos"""
+    author_id = client.post("/authors", json={"name": "Rosario Castellanos", "nationality": "Mexican"}).json()["id"]
+    book_data = {"title": "Balun Canan", "isbn": "9786071602381", "author_id": author_id}
+    book_id = client.post("/books", json=book_data).json()["id"]
+    loan_id = client.post("/loans", json={"book_id": book_id, "user_name": "Luis Mora"}).json()["id"]
+    cursor = client.get("/changes").json()["last_seq"]
+
+    response = client.delete(f"/books/{book_id}")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Book has active loans"
+
+    response = client.delete(f"/authors/{author_id}")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Author has books"
+
+    # Nada cambió: ni eventos nuevos ni filas hijas modificadas
+    assert client.get("/changes", params={"since": cursor}).json()["events"] == []
+    assert client.get(f"/loans/{loan_id}").json()["book_id"] == book_id
+    assert client.get(f"/books/{book_id}").json()["author_id"] == author_id
+
+    # Sin hijos, los borrados funcionan y aparecen en el feed
+    assert client.delete(f"/loans/{loan_id}").status_code == 204
+    assert client.delete(f"/books/{book_id}").status_code == 204
+    assert client.delete(f"/authors/{author_id}").status_code == 204
+    events = client.get("/changes", params={"since": cursor}).json()["events"]
+    assert [(e["entity"], e["action"]) for e in events] == [
+        ("loan", "deleted"), ("book", "updated"), ("book", "deleted"), ("author", "deleted")
+    ]
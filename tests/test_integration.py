@@ -3,38 +3,12 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from database import Base
-from models import Author, Book, Loan
+import changes
+from changes import record_change
+from models import Author, Book, Loan, Event
 from datetime import datetime
 
 
-TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite:///./test_library.db")
-
-# Detectar si es SQLite y usar connect_args solo en ese caso
-if TEST_DATABASE_URL.startswith("sqlite"):
-    test_engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    test_engine = create_engine(TEST_DATABASE_URL)
-
-# Crear sesión para pruebas
-TestSession = sessionmaker(bind=test_engine)
-
-
-@pytest.fixture
-def db_session():
-    """Sesión de prueba para base de datos"""
-    Base.metadata.create_all(bind=test_engine)
-    session = TestSession()
-    try:
-        yield session
-    finally:
-        session.close()
-        Base.metadata.drop_all(bind=test_engine)
-
-
 def test_insert_author_to_database(db_session):
     """Prueba 1: Insertar autor en base de datos"""
     # Crear un nuevo autor
@@ -151,4 +125,39 @@ def test_delete_loan_from_database(db_session):
 
     # Verificar conteo de préstamos
     remaining_loans = db_session.query(Loan).all()
-    assert len(remaining_loans) == 0
\ No newline at end of file
+    assert len(remaining_loans) == 0
+
+
+def test_record_change_flushes_before_outbox_lock(db_session, monkeypatch):
+    """Prueba 4: record_change vuelca los cambios pendientes antes del lock del outbox"""
+    author = Author(name="Horacio Quiroga", nationality="Uruguayan")
+    db_session.add(author)
+    db_session.commit()
+    book = Book(title="Cuentos de la Selva", isbn="ISBN-9788420633404", author_id=author.id, available=False)
+    db_session.add(book)
+    db_session.commit()
+    loan = Loan(book_id=book.id, user_name="Lector")
+    db_session.add(loan)
+    db_session.commit()
+
+    # Al pedir el lock no debe quedar ninguna escritura sin volcar
+    pending_at_lock = []
+
+    def fake_lock(db):
+        pending_at_lock.append((set(db.new), set(db.dirty), set(db.deleted)))
+
+    monkeypatch.setattr(changes, "_lock_outbox", fake_lock)
+
+    loan_id, book_id = loan.id, book.id
+
+    # Devolución: UPDATE del libro y DELETE del préstamo pendientes
+    book.available = True
+    db_session.delete(loan)
+    record_change(db_session, "loan", "deleted", loan_id)
+    record_change(db_session, "book", "updated", book_id)
+
+    assert pending_at_lock == [(set(), set(), set())] * 2
+    db_session.commit()
+
+    events = db_session.query(Event).order_by(Event.seq).all()
+    assert [(e.entity, e.action) for e in events] == [("loan", "deleted"), ("book", "updated")]
@@ -3,8 +3,12 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
+import pytest
+
 from main import validate_author_data, transform_book_data, calculate_loan_statistics
 from models import AuthorCreate, BookCreate
+from availability import AvailabilityIndex
+from server import calculate_pool_sizes
 
 
 
@@ -88,4 +92,64 @@ def test_calculate_loan_statistics():
     # Solo préstamos pendientes
     all_pending = [MockLoan(returned=False), MockLoan(returned=False)]
     stats_all_pending = calculate_loan_statistics(all_pending)
-    assert stats_all_pending == {"total": 2, "returned": 0, "pending": 2}
\ No newline at end of file
+    assert stats_all_pending == {"total": 2, "returned": 0, "pending": 2}
+
+
+def test_availability_index():
+    """Prueba 4: Índice de disponibilidad en memoria"""
+    index = AvailabilityIndex()
+
+    # Sin cargar: siempre fallo de caché
+    assert index.get(1) is None
+
+    index.loaded = True
+    index.set(3, True)
+    index.set(5, False)
+    assert index.get(3) == True
+    assert index.get(5) == False
+
+    # Posiciones desconocidas o fuera de rango
+    assert index.get(4) is None
+    assert index.get(100) is None
+    assert index.get(-1) is None
+
+    # Eliminar un libro lo convierte en fallo de caché
+    index.discard(3)
+    assert index.get(3) is None
+
+    # Un relleno con versión antigua se descarta
+    old_version = index.version
+    index.set(7, False)
+    index.fill(7, True, old_version)
+    assert index.get(7) == False
+
+    index.fill(8, True, index.version)
+    assert index.get(8) == True
+
+
+def test_calculate_pool_sizes():
+    """Prueba 5: Reparto de conexiones de Postgres entre workers"""
+    # 100 conexiones - 10 reservadas = 90 entre 4 workers
+    pool = calculate_pool_sizes(workers=4, max_connections=100)
+    assert pool == {"pool_size": 5, "max_overflow": 17}
+    assert 4 * (pool["pool_size"] + pool["max_overflow"]) <= 90
+
+    # Muchos workers: pool más pequeño, sin overflow
+    pool = calculate_pool_sizes(workers=30, max_connections=100)
+    assert pool == {"pool_size": 3, "max_overflow": 0}
+
+    # Justo una conexión por worker
+    pool = calculate_pool_sizes(workers=10, max_connections=20)
+    assert pool == {"pool_size": 1, "max_overflow": 0}
+
+    # Sin conexiones suficientes: error en lugar de superar el límite
+    with pytest.raises(ValueError):
+        calculate_pool_sizes(workers=8, max_connections=5)
+    with pytest.raises(ValueError):
+        calculate_pool_sizes(workers=16, max_connections=20)
+
+    # Número de workers inválido
+    with pytest.raises(ValueError):
+        calculate_pool_sizes(workers=0, max_connections=100)
+    with pytest.raises(ValueError):
+        calculate_pool_sizes(workers=-2, max_connections=100)